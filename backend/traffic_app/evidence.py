@@ -0,0 +1,154 @@
+"""
+Evidence image storage: content-addressed originals with cached WebP derivatives
+"""
+import glob
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# Longest edge in pixels for each derivative
+VARIANTS = {
+    'thumbnail': 320,
+    'preview': 1280,
+}
+WEBP_QUALITY = 80
+READ_CHUNK_SIZE = 64 * 1024
+
+HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+EVIDENCE_URL_RE = re.compile(r'/evidence/([0-9a-f]{64})/')
+
+
+def evidence_root():
+    return os.path.join(settings.MEDIA_ROOT, 'evidence')
+
+
+def _sharded(kind, name):
+    return os.path.join(evidence_root(), kind, name[:2], name)
+
+
+def original_path(content_hash):
+    """Path of a stored original, or None if the hash is unknown"""
+    if not HASH_RE.match(content_hash):
+        return None
+    matches = glob.glob(_sharded('originals', content_hash) + '.*')
+    return matches[0] if matches else None
+
+
+def derivative_path(content_hash, variant):
+    return _sharded('derived', f'{content_hash}_{variant}') + '.webp'
+
+
+def content_hash_from_url(url):
+    """Content hash of an evidence URL served by this app, None for external URLs"""
+    match = EVIDENCE_URL_RE.search(url or '')
+    return match.group(1) if match else None
+
+
+def iter_content_hashes():
+    """All stored originals"""
+    for path in glob.iglob(os.path.join(evidence_root(), 'originals', '*', '*')):
+        content_hash = os.path.basename(path).split('.', 1)[0]
+        if HASH_RE.match(content_hash):
+            yield content_hash
+
+
+def ingest(fileobj):
+    """
+    Store an uploaded or local image, returning its content hash.
+    Identical images share one original on disk, whichever report they came from.
+    """
+    incoming = os.path.join(evidence_root(), 'incoming')
+    os.makedirs(incoming, exist_ok=True)
+
+    hasher = hashlib.sha256()
+    tmp = tempfile.NamedTemporaryFile(dir=incoming, delete=False)
+    try:
+        with tmp:
+            for chunk in iter(lambda: fileobj.read(READ_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                tmp.write(chunk)
+        content_hash = hasher.hexdigest()
+        if original_path(content_hash):
+            return content_hash
+        try:
+            with Image.open(tmp.name) as image:
+                image_format = image.format
+                image.verify()
+        except Image.DecompressionBombError as exc:
+            raise ValueError('Evidence image dimensions are too large') from exc
+        except (UnidentifiedImageError, OSError, SyntaxError) as exc:
+            raise ValueError('Evidence file is not a valid image') from exc
+
+        extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+        dest = f"{_sharded('originals', content_hash)}.{extension}"
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(tmp.name, dest)
+        return content_hash
+    finally:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+
+def ingest_path(path):
+    with open(path, 'rb') as fileobj:
+        return ingest(fileobj)
+
+
+def _render(job):
+    """Render one derivative; runs inside pool workers, so no Django access"""
+    source, dest, max_size = job
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        # Write to a unique temp file then rename, so concurrent renders of the
+        # same derivative (threads or processes) never share or expose a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                image.save(out, 'WEBP', quality=WEBP_QUALITY)
+            os.replace(tmp, dest)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    return dest
+
+
+def get_derivative(content_hash, variant):
+    """Path of a cached derivative, rendered on first request; None if unknown"""
+    if not HASH_RE.match(content_hash):
+        return None
+    dest = derivative_path(content_hash, variant)
+    if os.path.exists(dest):
+        return dest
+    source = original_path(content_hash)
+    if source is None:
+        return None
+    return _render((source, dest, VARIANTS[variant]))
+
+
+def generate_derivatives(content_hashes, variants=None, workers=None):
+    """Render every missing derivative for the given originals in a process pool"""
+    jobs = []
+    for content_hash in dict.fromkeys(content_hashes):
+        source = original_path(content_hash)
+        if source is None:
+            continue
+        for variant in variants or VARIANTS:
+            dest = derivative_path(content_hash, variant)
+            if not os.path.exists(dest):
+                jobs.append((source, dest, VARIANTS[variant]))
+    if not jobs:
+        return 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for _ in pool.map(_render, jobs, chunksize=8):
+            pass
+    return len(jobs)
@@ -0,0 +1,292 @@
+"""
+Hour-of-week traffic pattern profiles and forecasts per location
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+from scipy.ndimage import gaussian_filter1d
+
+from .models import TrafficViolation, IoTSensor, SensorReadingChunk
+
+
+HOURS_PER_WEEK = 168
+REFRESH_SECONDS = 60  # incremental refit at most this often
+FULL_REFIT_SECONDS = 3600  # periodic full refit picks up late sensor data
+SMOOTHING_HOURS = 1.0  # gaussian sigma along the (circular) week
+MAX_HORIZON_HOURS = HOURS_PER_WEEK
+SENSOR_TYPES = [code for code, _ in IoTSensor.SENSOR_TYPES]
+# Higher readings mean freer-flowing traffic, so these count inversely towards congestion
+INVERSE_SENSOR_TYPES = {'SPEED'}
+
+
+@contextmanager
+def _snapshot():
+    """
+    One transaction for a refit's reads. PostgreSQL's default READ COMMITTED
+    takes a new snapshot per statement, so ask for REPEATABLE READ when this
+    is the outermost transaction; a SQLite read transaction already sees one.
+    """
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def _hour_of_week(iso_weekday, hour):
+    """Monday 00:00 is hour 0, in the active time zone"""
+    return ((np.asarray(iso_weekday, dtype=int) - 1) * 24 + np.asarray(hour, dtype=int)) % HOURS_PER_WEEK
+
+
+class PatternEngine:
+    """
+    Violation-rate profiles (locations x 168 hours) and sensor reading profiles
+    kept apart per sensor type (types x locations x 168 hours), aggregated in
+    the database and refit incrementally as new rows arrive.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.locations = {}
+        self.violation_counts = np.zeros((0, HOURS_PER_WEEK))
+        self.sensor_sums = np.zeros((len(SENSOR_TYPES), 0, HOURS_PER_WEEK))
+        self.sensor_counts = np.zeros((len(SENSOR_TYPES), 0, HOURS_PER_WEEK))
+        self.first_violation = None
+        self.last_violation = None
+        self.last_violation_id = 0
+        self.sensor_watermark = None
+        # Aggregate of the newest sensor window(s), which may still be growing
+        self._sensor_tail = None
+        self.refreshed_at = None
+        self.full_refit_at = None
+        self._publish()
+
+    @staticmethod
+    def _rows(locations, names, *matrices):
+        """Row indexes for names, adding new locations and growing the matrices' location axis"""
+        for name in names:
+            if name not in locations:
+                locations[name] = len(locations)
+        grow = len(locations) - matrices[0].shape[-2]
+        grown = [
+            np.concatenate([matrix, np.zeros(matrix.shape[:-2] + (grow, HOURS_PER_WEEK))], axis=-2) if grow else matrix
+            for matrix in matrices
+        ]
+        return np.fromiter((locations[name] for name in names), int, len(names)), grown
+
+    @staticmethod
+    def _violation_aggregate(after_id, last_id):
+        return TrafficViolation.objects.filter(id__gt=after_id, id__lte=last_id).annotate(
+            weekday=ExtractIsoWeekDay('violation_time'),
+            hour=ExtractHour('violation_time'),
+        ).values('location', 'weekday', 'hour').annotate(count=Count('id')).order_by()
+
+    @staticmethod
+    def _sensor_aggregate(since, until):
+        queryset = SensorReadingChunk.objects.filter(window_start__lte=until, sensor__sensor_type__in=SENSOR_TYPES)
+        if since is not None:
+            queryset = queryset.filter(window_start__gte=since)
+        rows = list(queryset.annotate(
+            weekday=ExtractIsoWeekDay('window_start'),
+            hour=ExtractHour('window_start'),
+        ).values('sensor__location', 'sensor__sensor_type', 'weekday', 'hour').annotate(
+            total=Sum('sum_value'),
+            readings=Sum('reading_count'),
+        ).order_by())
+        return (
+            [row['sensor__location'] for row in rows],
+            np.fromiter((SENSOR_TYPES.index(row['sensor__sensor_type']) for row in rows), int, len(rows)),
+            _hour_of_week([row['weekday'] for row in rows], [row['hour'] for row in rows]),
+            np.fromiter((row['total'] for row in rows), float, len(rows)),
+            np.fromiter((row['readings'] for row in rows), float, len(rows)),
+        )
+
+    def refit(self, full=False):
+        """Fold rows added since the last fit into the profiles (or rebuild them)"""
+        with self._lock:
+            self._refit(full)
+
+    def _refit(self, full):
+        """refit() with the lock already held"""
+        if full:
+            # Build into fresh arrays so forecasts keep the current snapshot meanwhile
+            locations, last_id, first, last, since, tail = {}, 0, None, None, None, None
+            counts = np.zeros((0, HOURS_PER_WEEK))
+            sums = readings = np.zeros((len(SENSOR_TYPES), 0, HOURS_PER_WEEK))
+        else:
+            locations = dict(self.locations)
+            counts = self.violation_counts.copy()
+            sums = self.sensor_sums.copy()
+            readings = self.sensor_counts.copy()
+            last_id, first, last = self.last_violation_id, self.first_violation, self.last_violation
+            since, tail = self.sensor_watermark, self._sensor_tail
+
+        # Fix the upper bounds first and read everything from one snapshot, so
+        # the newest window added here is exactly the tail subtracted next time
+        with _snapshot():
+            span = TrafficViolation.objects.filter(id__gt=last_id).aggregate(
+                last_id=Max('id'), first=Min('violation_time'), last=Max('violation_time')
+            )
+            rows = list(self._violation_aggregate(last_id, span['last_id'])) if span['last_id'] else []
+            watermark = SensorReadingChunk.objects.aggregate(newest=Max('window_start'))['newest']
+            added = self._sensor_aggregate(since, watermark) if watermark else None
+            new_tail = self._sensor_aggregate(watermark, watermark) if watermark else None
+
+        if span['last_id'] is not None:
+            index, (counts, sums, readings) = self._rows(
+                locations, [row['location'] for row in rows], counts, sums, readings
+            )
+            hours = _hour_of_week([row['weekday'] for row in rows], [row['hour'] for row in rows])
+            np.add.at(counts, (index, hours), [row['count'] for row in rows])
+            last_id = span['last_id']
+            first = min(filter(None, [first, span['first']]))
+            last = max(filter(None, [last, span['last']]))
+
+        if tail is not None:
+            names, types, hours, totals, tail_readings = tail
+            index = np.fromiter((locations[name] for name in names), int, len(names))
+            np.subtract.at(sums, (types, index, hours), totals)
+            np.subtract.at(readings, (types, index, hours), tail_readings)
+        if added is not None:
+            names, types, hours, totals, new_readings = added
+            index, (counts, sums, readings) = self._rows(locations, names, counts, sums, readings)
+            np.add.at(sums, (types, index, hours), totals)
+            np.add.at(readings, (types, index, hours), new_readings)
+
+        self.last_violation_id, self.first_violation, self.last_violation = last_id, first, last
+        self.sensor_watermark, self._sensor_tail = watermark, new_tail
+        self.locations = locations
+        self.violation_counts, self.sensor_sums, self.sensor_counts = counts, sums, readings
+        self._publish()
+        self.refreshed_at = time.monotonic()
+        if full or self.full_refit_at is None:
+            self.full_refit_at = self.refreshed_at
+
+    def _publish(self):
+        """
+        Derive the smoothed profiles and swap them in as one snapshot, so
+        forecasts running during a refit never mix old and new arrays
+        """
+        weeks = 1.0
+        if self.first_violation is not None:
+            weeks = max(1.0, (self.last_violation - self.first_violation) / timedelta(weeks=1))
+        rates = gaussian_filter1d(self.violation_counts / weeks, SMOOTHING_HOURS, axis=1, mode='wrap')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Mean reading per sensor type, location and hour; NaN without data
+            levels = self.sensor_sums / self.sensor_counts
+            # Each type against its own reading-weighted weekly mean, inverted
+            # where needed so above 1 always means busier than usual
+            typical = self.sensor_sums.sum(axis=2) / self.sensor_counts.sum(axis=2)
+            relative = levels / typical[..., None]
+            inverse = [code in INVERSE_SENSOR_TYPES for code in SENSOR_TYPES]
+            relative[inverse] = 1 / relative[inverse]
+            known = np.isfinite(relative)
+            congestion_index = np.where(known, relative, 0).sum(axis=0) / known.sum(axis=0)
+        self._snapshot = (self.locations, rates, levels, congestion_index)
+
+    def _due(self):
+        """(full refit due, incremental refit due)"""
+        now = time.monotonic()
+        return now - self.full_refit_at > FULL_REFIT_SECONDS, now - self.refreshed_at > REFRESH_SECONDS
+
+    def refresh(self):
+        """
+        Refit if the cached profiles are stale. Only the first fit blocks the
+        caller; after that a request that finds a refit already running keeps
+        serving the current profiles, and the periodic full refit runs in a
+        background thread.
+        """
+        if self.refreshed_at is None:
+            with self._lock:
+                # Another request may have finished the first fit while we waited
+                if self.refreshed_at is None:
+                    self._refit(full=True)
+            return
+        if not any(self._due()) or not self._lock.acquire(blocking=False):
+            return
+        full, stale = self._due()  # re-check now that we hold the lock
+        if full:
+            self._start_background_refit()
+            return
+        try:
+            if stale:
+                self._refit(full=False)
+        finally:
+            self._lock.release()
+
+    def refit_in_background(self):
+        """Start a full refit on a worker thread; False if a refit is already running"""
+        if not self._lock.acquire(blocking=False):
+            return False
+        self._start_background_refit()
+        return True
+
+    def _start_background_refit(self):
+        threading.Thread(target=self._refit_in_background, daemon=True).start()
+
+    def _refit_in_background(self):
+        """Full refit on a worker thread; releases the lock its starter took"""
+        try:
+            self._refit(full=True)
+        finally:
+            connection.close()
+            self._lock.release()
+
+    def profile(self, location):
+        """
+        168-hour (smoothed violation rate, {sensor type: mean reading}, congestion
+        index) profile, or None if the location is unknown
+        """
+        locations, rates, levels, congestion_index = self._snapshot
+        if location not in locations:
+            return None
+        row = locations[location]
+        return rates[row], dict(zip(SENSOR_TYPES, levels[:, row])), congestion_index[row]
+
+    def forecast(self, locations=None, start=None, hours=24):
+        """
+        Expected violations and congestion for each location over the next
+        `hours` hours, computed for all locations in one batch.
+        """
+        if not 1 <= hours <= MAX_HORIZON_HOURS:
+            raise ValueError(f'hours must be between 1 and {MAX_HORIZON_HOURS}')
+        known_locations, rates, levels, congestion_index = self._snapshot
+        if locations is None:
+            locations = list(known_locations)
+        known = [location for location in locations if location in known_locations]
+        index = np.fromiter((known_locations[location] for location in known), int, len(known))
+
+        start = timezone.localtime(start or timezone.now()).replace(minute=0, second=0, microsecond=0)
+        first_hour = _hour_of_week(start.isoweekday(), start.hour)
+        columns = (first_hour + np.arange(hours)) % HOURS_PER_WEEK
+
+        rows = index[:, None]
+        return {
+            'start': start,
+            'hours': [start + timedelta(hours=offset) for offset in range(hours)],
+            'locations': known,
+            'expected_violations': rates[rows, columns],
+            'sensor_levels': {code: levels[i][rows, columns] for i, code in enumerate(SENSOR_TYPES)},
+            'congestion_index': congestion_index[rows, columns],
+        }
+
+
+_engine = PatternEngine()
+
+
+def get_engine(refresh=True):
+    """Process-wide engine, refit lazily when its profiles go stale unless `refresh` is False"""
+    if refresh:
+        _engine.refresh()
+    return _engine
@@ -0,0 +1,68 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from traffic_app.forecasting import PatternEngine
+from traffic_app.models import TrafficViolation
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time pattern profile fitting and forecast queries on synthetic data (all data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=500)
+        parser.add_argument('--violations', type=int, default=200000)
+        parser.add_argument('--queries', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['locations'], options['violations'], options['queries'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _create_violations(self, user, locations, count, offset, rng):
+        now = timezone.now()
+        hours_ago = rng.integers(0, 24 * 7 * 12, count)
+        places = rng.integers(0, len(locations), count)
+        TrafficViolation.objects.bulk_create([
+            TrafficViolation(
+                violation_id=f'BENCH-P{offset + i}', violator_name='Benchmark', vehicle_number='BENCH',
+                violation_type='SPEEDING', location=locations[place], description='',
+                violation_time=now - timedelta(hours=int(hours)), reported_by=user
+            )
+            for i, (hours, place) in enumerate(zip(hours_ago, places))
+        ], batch_size=2000)
+
+    def _timed(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        self.stdout.write(f'{label}: {(time.perf_counter() - started) * 1000:.1f} ms')
+        return result
+
+    def _run(self, location_count, violation_count, queries):
+        rng = np.random.default_rng(0)
+        user = User.objects.create(username='patterns-benchmark')
+        locations = [f'Benchmark Junction {i}' for i in range(location_count)]
+        self._create_violations(user, locations, violation_count, 0, rng)
+
+        engine = PatternEngine()
+        self._timed(f'full fit ({violation_count} violations, {location_count} locations)', lambda: engine.refit(full=True))
+        self._create_violations(user, locations, violation_count // 100, violation_count, rng)
+        self._timed(f'incremental refit (+{violation_count // 100} violations)', engine.refit)
+
+        started = time.perf_counter()
+        for _ in range(queries):
+            engine.forecast(hours=24)
+        elapsed = (time.perf_counter() - started) / queries
+        self.stdout.write(f'forecast, all locations x 24h: {elapsed * 1000:.2f} ms/query')
@@ -0,0 +1,69 @@
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from traffic_app.models import TrafficViolation, Fine
+from traffic_app.reconciliation import CHUNK_SIZE, reconcile_settlement
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time reconciliation of a synthetic settlement file (all data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fines', type=int, default=20000)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        count = options['fines']
+        try:
+            with transaction.atomic():
+                self._run(count, options['chunk_size'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, count, chunk_size):
+        user = User.objects.create(username='reconciliation-benchmark')
+        now = timezone.now()
+        violations = TrafficViolation.objects.bulk_create([
+            TrafficViolation(
+                violation_id=f'BENCH-V{i}', violator_name='Benchmark', vehicle_number=f'BN{i:08d}',
+                violation_type='SPEEDING', location='Benchmark', description='',
+                violation_time=now, reported_by=user
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        amount = Decimal('500.00')
+        Fine.objects.bulk_create([
+            Fine(
+                fine_id=f'BENCH-F{i}', violation=violation, base_amount=amount, final_amount=amount,
+                amount_after_discount=amount, due_date=(now + timedelta(days=30)).date()
+            )
+            for i, violation in enumerate(violations)
+        ], batch_size=1000)
+
+        lines = ['fine_id,transaction_id,amount,paid_date,payment_method']
+        lines += [f'BENCH-F{i},BENCH-T{i},500.00,{now.date()},card' for i in range(count)]
+        # A tail of unknown fines to exercise the mismatch report
+        lines += [f'BENCH-MISSING{i},BENCH-MT{i},500.00,,card' for i in range(count // 100)]
+        settlement = '\n'.join(lines) + '\n'
+
+        for label in ('initial', 'replay'):
+            started = time.perf_counter()
+            result = reconcile_settlement(io.StringIO(settlement), chunk_size)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label}: {result['rows']} rows in {elapsed:.2f}s "
+                f"({result['rows'] / elapsed:,.0f} rows/s) - {result['applied']} applied, "
+                f"{result['already_applied']} already applied, {result['mismatched']} mismatched"
+            )
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from traffic_app.models import TrafficViolation, Fine, Notification
+
+
+PAGE_SIZE = 20  # StandardResultsSetPagination.page_size
+
+
+def hot_queries():
+    """
+    Querysets mirroring the hot API access paths as the views issue them
+    (filters, default ordering and page slice), keyed by endpoint, with the
+    index each one is expected to use
+    """
+    today = timezone.now().date()
+    six_months_ago = timezone.now() - timedelta(days=180)
+    user = User(pk=1)
+    return {
+        'violations/pending_review': (
+            TrafficViolation.objects.filter(is_verified=False).order_by('-risk_score', '-reported_at')[:PAGE_SIZE],
+            'violation_pending_risk_idx',
+        ),
+        'fines/overdue_fines': (
+            Fine.objects.filter(payment_status='PENDING', due_date__lt=today)[:PAGE_SIZE],
+            'fine_pending_created_idx',
+        ),
+        'Fine.calculate_fine': (
+            TrafficViolation.objects.filter(
+                vehicle_number='KA01AB1234',
+                violation_time__gte=six_months_ago
+            ).order_by(),
+            'violation_vehicle_time_idx',
+        ),
+        'notifications/unread': (
+            Notification.objects.filter(user=user, is_read=False)[:PAGE_SIZE],
+            'notification_unread_idx',
+        ),
+    }
+
+
+def explain_hot_queries():
+    """(endpoint, expected index, plan) for each hot query on the default database"""
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        raise CommandError(f'Unsupported database backend: {connection.vendor}')
+    plans = []
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Tiny tables always favour a sequential scan; we only care
+            # which index the planner picks once it has to use one.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        for name, (queryset, index_name) in hot_queries().items():
+            plans.append((name, index_name, queryset.explain()))
+    return plans
+
+
+class Command(BaseCommand):
+    help = 'Explain the hot endpoint queries and fail if any of them does not use its dedicated index'
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, index_name, plan in explain_hot_queries():
+            uses_index = index_name in plan
+            self.stdout.write(f'{name}: {index_name if uses_index else "MISSING " + index_name}')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+            if not uses_index:
+                failures.append(name)
+
+        if failures:
+            raise CommandError(f'Queries not using their index: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('All hot queries use their index'))
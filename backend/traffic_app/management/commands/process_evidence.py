@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from traffic_app import evidence
+
+
+class Command(BaseCommand):
+    help = 'Ingest local evidence images and pre-render their thumbnail/WebP derivatives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Image files to ingest')
+        parser.add_argument('--all', action='store_true', help='Render derivatives for every stored original')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+
+    def handle(self, *args, **options):
+        hashes = []
+        for path in options['paths']:
+            try:
+                content_hash = evidence.ingest_path(path)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'{path}: {exc}')
+            self.stdout.write(f'{path} -> {content_hash}')
+            hashes.append(content_hash)
+
+        if options['all']:
+            hashes = evidence.iter_content_hashes()
+
+        started = time.perf_counter()
+        rendered = evidence.generate_derivatives(hashes, workers=options['workers'])
+        self.stdout.write(f'Rendered {rendered} derivatives in {time.perf_counter() - started:.2f}s')
@@ -0,0 +1,36 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from traffic_app.reconciliation import CHUNK_SIZE, reconcile_settlement
+
+
+class Command(BaseCommand):
+    help = 'Mark fines as paid from a payment gateway settlement CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('settlement_file')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Match rows without writing')
+        parser.add_argument('--report', help='Write mismatched rows to this CSV file')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['settlement_file'], newline='', encoding='utf-8-sig') as lines:
+                result = reconcile_settlement(lines, options['chunk_size'], options['dry_run'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as out:
+                writer = csv.DictWriter(out, fieldnames=['line', 'fine_id', 'transaction_id', 'reason'])
+                writer.writeheader()
+                writer.writerows(result['mismatches'])
+
+        self.stdout.write(
+            f"{result['rows']} rows in {elapsed:.2f}s: {result['applied']} applied, "
+            f"{result['already_applied']} already applied, {result['mismatched']} mismatched"
+        )
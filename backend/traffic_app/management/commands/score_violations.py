@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from traffic_app.models import TrafficViolation
+from traffic_app.scoring import BATCH_SIZE, get_model, score_queryset
+
+
+class Command(BaseCommand):
+    help = 'Batch-score violations with the trained risk model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Score verified violations too')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if get_model() is None:
+            raise CommandError('No risk model found; run train_risk_model first')
+        queryset = TrafficViolation.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(is_verified=False)
+        started = time.perf_counter()
+        scored = score_queryset(queryset, options['batch_size'])
+        self.stdout.write(f'Scored {scored} violations in {time.perf_counter() - started:.2f}s')
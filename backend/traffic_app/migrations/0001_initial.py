@@ -0,0 +1,176 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:30
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fine_id', models.CharField(db_index=True, max_length=50, unique=True)),
+                ('base_amount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('severity_multiplier', models.FloatField(default=1.0, validators=[django.core.validators.MinValueValidator(0.5), django.core.validators.MaxValueValidator(4.0)])),
+                ('repeat_offender_multiplier', models.FloatField(default=1.0, validators=[django.core.validators.MinValueValidator(1.0), django.core.validators.MaxValueValidator(3.0)])),
+                ('final_amount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('discount_percentage', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('amount_after_discount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('payment_status', models.CharField(choices=[('PENDING', 'Pending'), ('PAID', 'Paid'), ('OVERDUE', 'Overdue'), ('WAIVED', 'Waived')], default='PENDING', max_length=20)),
+                ('due_date', models.DateField()),
+                ('paid_date', models.DateField(blank=True, null=True)),
+                ('payment_method', models.CharField(blank=True, max_length=50, null=True)),
+                ('transaction_id', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('notes', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrafficViolation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('violation_id', models.CharField(db_index=True, max_length=50, unique=True)),
+                ('violator_name', models.CharField(max_length=255)),
+                ('vehicle_number', models.CharField(db_index=True, max_length=20)),
+                ('violation_type', models.CharField(choices=[('SPEEDING', 'Speeding'), ('SIGNAL_JUMP', 'Traffic Signal Jump'), ('PARKING', 'Invalid Parking'), ('LANE_CHANGE', 'Unsafe Lane Change'), ('NO_HELMET', 'No Helmet'), ('RASH_DRIVING', 'Rash Driving'), ('OTHER', 'Other')], max_length=20)),
+                ('severity', models.IntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High'), (4, 'Critical')], default=1)),
+                ('location', models.CharField(max_length=255)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('description', models.TextField()),
+                ('violation_time', models.DateTimeField()),
+                ('reported_at', models.DateTimeField(auto_now_add=True)),
+                ('evidence_image', models.URLField(blank=True, null=True)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('verified_at', models.DateTimeField(blank=True, null=True)),
+                ('reported_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='violations_reported', to=settings.AUTH_USER_MODEL)),
+                ('verified_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='violations_verified', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-reported_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrafficReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_id', models.CharField(db_index=True, max_length=50, unique=True)),
+                ('description', models.TextField()),
+                ('evidence_urls', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('SUBMITTED', 'Submitted'), ('UNDER_REVIEW', 'Under Review'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], default='SUBMITTED', max_length=20)),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('review_comments', models.TextField(blank=True)),
+                ('reward_points', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('reporter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='traffic_reports', to=settings.AUTH_USER_MODEL)),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports_reviewed', to=settings.AUTH_USER_MODEL)),
+                ('violation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reports', to='traffic_app.trafficviolation')),
+            ],
+            options={
+                'ordering': ['-submitted_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('VIOLATION', 'Violation Reported'), ('FINE', 'Fine Generated'), ('PAYMENT', 'Payment Reminder'), ('ACHIEVEMENT', 'Achievement Unlocked'), ('ALERT', 'System Alert')], max_length=20)),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('related_fine', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='traffic_app.fine')),
+                ('related_violation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='traffic_app.trafficviolation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.IntegerField()),
+                ('points', models.IntegerField()),
+                ('reports_submitted', models.IntegerField()),
+                ('verified_reports', models.IntegerField()),
+                ('badge_level', models.IntegerField()),
+                ('date', models.DateField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.AddField(
+            model_name='fine',
+            name='violation',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fine', to='traffic_app.trafficviolation'),
+        ),
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('violations_count', models.IntegerField(default=0)),
+                ('reports_count', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('badge_level', models.IntegerField(default=1)),
+                ('driver_license', models.CharField(blank=True, max_length=50, null=True, unique=True)),
+                ('phone_number', models.CharField(blank=True, max_length=15)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('avatar', models.URLField(blank=True, null=True)),
+                ('is_verified_driver', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-points'],
+                'indexes': [models.Index(fields=['-points'], name='traffic_app_points_1afa0b_idx'), models.Index(fields=['badge_level'], name='traffic_app_badge_l_bb2d22_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trafficviolation',
+            index=models.Index(fields=['vehicle_number', '-reported_at'], name='traffic_app_vehicle_15e2ed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficviolation',
+            index=models.Index(fields=['violation_type', '-reported_at'], name='traffic_app_violati_a9db0d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficreport',
+            index=models.Index(fields=['status', '-submitted_at'], name='traffic_app_status_9929a5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='traffic_app_user_id_ee8af2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['date', 'rank'], name='traffic_app_date_d54c7a_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leaderboard',
+            unique_together={('user', 'date')},
+        ),
+        migrations.AddIndex(
+            model_name='fine',
+            index=models.Index(fields=['-created_at'], name='traffic_app_created_23947e_idx'),
+        ),
+    ]
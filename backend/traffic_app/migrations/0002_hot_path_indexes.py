@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fine',
+            index=models.Index(condition=models.Q(('payment_status', 'PENDING')), fields=['-created_at', 'due_date'], name='fine_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficviolation',
+            index=models.Index(fields=['vehicle_number', 'violation_time'], name='violation_vehicle_time_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+def blank_to_null(apps, schema_editor):
+    Fine = apps.get_model('traffic_app', 'Fine')
+    Fine.objects.filter(transaction_id='').update(transaction_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_app', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_to_null, migrations.RunPython.noop),
+    ]
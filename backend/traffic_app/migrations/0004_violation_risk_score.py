@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_app', '0003_blank_transaction_ids_to_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trafficviolation',
+            name='risk_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddIndex(
+            model_name='trafficviolation',
+            index=models.Index(condition=models.Q(('is_verified', False)), fields=['-risk_score', '-reported_at'], name='violation_pending_risk_idx'),
+        ),
+    ]
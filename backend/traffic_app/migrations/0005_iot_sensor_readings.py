@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_app', '0004_violation_risk_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IoTSensor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.CharField(db_index=True, max_length=50, unique=True)),
+                ('sensor_type', models.CharField(choices=[('LOOP', 'Loop Detector'), ('SPEED', 'Speed Sensor'), ('OCCUPANCY', 'Occupancy Sensor')], max_length=20)),
+                ('location', models.CharField(max_length=255)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('installed_at', models.DateTimeField(auto_now_add=True)),
+                ('last_reading_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['sensor_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SensorReadingChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_start', models.DateTimeField()),
+                ('reading_count', models.IntegerField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('timestamps', models.BinaryField()),
+                ('values', models.BinaryField()),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reading_chunks', to='traffic_app.iotsensor')),
+            ],
+            options={
+                'ordering': ['window_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='iotsensor',
+            index=models.Index(fields=['location'], name='traffic_app_locatio_6dc9ae_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sensorreadingchunk',
+            unique_together={('sensor', 'window_start')},
+        ),
+    ]
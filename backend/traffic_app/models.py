@@ -41,12 +41,21 @@ class TrafficViolation(models.Model):
     is_verified = models.BooleanField(default=False)
     verified_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='violations_verified')
     verified_at = models.DateTimeField(null=True, blank=True)
+    risk_score = models.FloatField(default=0.0)  # Predicted likelihood the violation is upheld
     
     class Meta:
         ordering = ['-reported_at']
         indexes = [
             models.Index(fields=['vehicle_number', '-reported_at']),
             models.Index(fields=['violation_type', '-reported_at']),
+            # Repeat-offense lookups in Fine.calculate_fine
+            models.Index(fields=['vehicle_number', 'violation_time'], name='violation_vehicle_time_idx'),
+            # Moderation queue (pending_review): unverified rows, likeliest first
+            models.Index(
+                fields=['-risk_score', '-reported_at'],
+                name='violation_pending_risk_idx',
+                condition=models.Q(is_verified=False),
+            ),
         ]
     
     def __str__(self):
@@ -157,8 +166,14 @@ class Fine(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['payment_status', 'due_date']),
             models.Index(fields=['-created_at']),
+            # overdue_fines: pending fines in the default -created_at order,
+            # with due_date in the index so the range is checked before the row fetch
+            models.Index(
+                fields=['-created_at', 'due_date'],
+                name='fine_pending_created_idx',
+                condition=models.Q(payment_status='PENDING'),
+            ),
         ]
     
     def __str__(self):
@@ -248,8 +263,64 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', '-created_at']),
-            models.Index(fields=['user', 'is_read']),
+            # Unread notifications per user, newest first
+            models.Index(
+                fields=['user', '-created_at'],
+                name='notification_unread_idx',
+                condition=models.Q(is_read=False),
+            ),
         ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
+
+
+class IoTSensor(models.Model):
+    """
+    Roadside IoT sensors (loop detectors, speed sensors) streaming readings
+    """
+    SENSOR_TYPES = [
+        ('LOOP', 'Loop Detector'),
+        ('SPEED', 'Speed Sensor'),
+        ('OCCUPANCY', 'Occupancy Sensor'),
+    ]
+    
+    sensor_id = models.CharField(max_length=50, unique=True, db_index=True)
+    sensor_type = models.CharField(max_length=20, choices=SENSOR_TYPES)
+    location = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    installed_at = models.DateTimeField(auto_now_add=True)
+    last_reading_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['sensor_id']
+        indexes = [
+            models.Index(fields=['location']),
+        ]
+    
+    def __str__(self):
+        return f"{self.sensor_id} ({self.sensor_type})"
+
+
+class SensorReadingChunk(models.Model):
+    """
+    One sensor's readings over a fixed time window, stored as compressed arrays
+    instead of one row per reading (see traffic_app.timeseries)
+    """
+    sensor = models.ForeignKey(IoTSensor, on_delete=models.CASCADE, related_name='reading_chunks')
+    window_start = models.DateTimeField()
+    reading_count = models.IntegerField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    sum_value = models.FloatField()
+    timestamps = models.BinaryField()  # zlib-compressed uint32 millisecond deltas
+    values = models.BinaryField()  # zlib-compressed float32
+    
+    class Meta:
+        ordering = ['window_start']
+        unique_together = ['sensor', 'window_start']
+    
+    def __str__(self):
+        return f"{self.sensor.sensor_id} @ {self.window_start} ({self.reading_count} readings)"
@@ -0,0 +1,150 @@
+"""
+Violation risk scoring: likelihood that a reported violation will be upheld
+"""
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import TrafficViolation
+
+
+BATCH_SIZE = 1000
+FEATURE_FIELDS = (
+    'id', 'reported_by_id', 'violation_type', 'severity', 'evidence_image',
+    'latitude', 'description', 'is_verified'
+)
+VIOLATION_TYPES = [code for code, _ in TrafficViolation.VIOLATION_TYPES]
+# Beta prior for a reporter's track record, so new reporters start at 50%
+REPORTER_PRIOR = 2.0
+
+_model_lock = threading.Lock()
+_model_cache = {'mtime': None, 'model': None}
+
+
+def _reporter_stats(reporter_ids):
+    """Verified/total counts per reporter, one query per batch"""
+    rows = TrafficViolation.objects.filter(reported_by_id__in=reporter_ids).values('reported_by_id').annotate(
+        total=Count('id'),
+        verified=Count('id', filter=Q(is_verified=True))
+    )
+    return {row['reported_by_id']: (row['verified'], row['total']) for row in rows}
+
+
+def build_features(rows):
+    """
+    Feature matrix for a batch of violation value dicts. Each row is left out
+    of its own reporter's track record so the label doesn't leak in training.
+    """
+    count = len(rows)
+    stats = _reporter_stats({row['reported_by_id'] for row in rows})
+    verified = np.empty(count)
+    total = np.empty(count)
+    for i, row in enumerate(rows):
+        verified[i], total[i] = stats.get(row['reported_by_id'], (0, 0))
+    verified -= np.fromiter((row['is_verified'] for row in rows), float, count)
+    total = np.maximum(total - 1, 0)
+    reporter_rate = (verified + REPORTER_PRIOR / 2) / (total + REPORTER_PRIOR)
+
+    type_index = {code: i for i, code in enumerate(VIOLATION_TYPES)}
+    one_hot = np.zeros((count, len(VIOLATION_TYPES)))
+    one_hot[np.arange(count), [type_index.get(row['violation_type'], type_index['OTHER']) for row in rows]] = 1
+
+    severity = np.fromiter((row['severity'] for row in rows), float, count)
+    has_evidence = np.fromiter((bool(row['evidence_image']) for row in rows), float, count)
+    has_coordinates = np.fromiter((row['latitude'] is not None for row in rows), float, count)
+    description_length = np.log1p(np.fromiter((len(row['description'] or '') for row in rows), float, count))
+
+    return np.column_stack([
+        severity, has_evidence, has_coordinates, description_length,
+        reporter_rate, np.log1p(total), one_hot
+    ])
+
+
+def training_data():
+    """Labelled history: verified or approved = 1, rejected and unverified = 0"""
+    rows = list(
+        TrafficViolation.objects.annotate(
+            approved_reports=Count('reports', filter=Q(reports__status='APPROVED')),
+            rejected_reports=Count('reports', filter=Q(reports__status='REJECTED')),
+        ).filter(
+            Q(is_verified=True) | Q(approved_reports__gt=0) | Q(rejected_reports__gt=0)
+        ).values(*FEATURE_FIELDS, 'approved_reports')
+    )
+    labels = np.fromiter((row['is_verified'] or row['approved_reports'] > 0 for row in rows), float, len(rows))
+    features = build_features(rows) if rows else np.empty((0, 0))
+    return features, labels
+
+
+def train_model(path=None):
+    """Fit the model on historical outcomes and persist it; returns (samples, accuracy)"""
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import cross_val_score
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    features, labels = training_data()
+    if len(np.unique(labels)) < 2:
+        raise ValueError('Training needs both upheld and rejected violations')
+
+    model = make_pipeline(StandardScaler(), LogisticRegression(class_weight='balanced', max_iter=1000))
+    folds = min(5, int(np.bincount(labels.astype(int)).min()))
+    accuracy = cross_val_score(model, features, labels, cv=folds).mean() if folds >= 2 else None
+    model.fit(features, labels)
+
+    path = path or settings.RISK_MODEL_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump({'model': model, 'trained_at': timezone.now(), 'samples': len(labels)}, path)
+    return len(labels), accuracy
+
+
+def get_model():
+    """
+    The trained model, loaded lazily once per process and reloaded when the
+    file on disk changes. None until a model has been trained.
+    """
+    path = settings.RISK_MODEL_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _model_cache['mtime'] != mtime:
+        with _model_lock:
+            if _model_cache['mtime'] != mtime:
+                import joblib
+                _model_cache['model'] = joblib.load(path)['model']
+                _model_cache['mtime'] = mtime
+    return _model_cache['model']
+
+
+def score_rows(rows):
+    """Probability that each violation is upheld, or None without a model"""
+    model = get_model()
+    if model is None or not rows:
+        return None
+    return model.predict_proba(build_features(rows))[:, 1]
+
+
+def score_queryset(queryset, batch_size=BATCH_SIZE):
+    """Score and store risk_score for every violation in the queryset; returns the count"""
+    if get_model() is None:
+        return 0
+    scored = 0
+    last_id = 0
+    queryset = queryset.order_by('id')
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).values(*FEATURE_FIELDS)[:batch_size])
+        if not rows:
+            return scored
+        scores = score_rows(rows)
+        TrafficViolation.objects.bulk_update(
+            [TrafficViolation(id=row['id'], risk_score=float(score)) for row, score in zip(rows, scores)],
+            ['risk_score'],
+            batch_size=500
+        )
+        scored += len(rows)
+        last_id = rows[-1]['id']
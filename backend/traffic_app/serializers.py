@@ -1,9 +1,19 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from django.contrib.auth.models import User
 from .models import (
     TrafficViolation, UserProfile, TrafficReport, 
-    Fine, Leaderboard, Notification
+    Fine, Leaderboard, Notification, IoTSensor
 )
+from .evidence import content_hash_from_url
+
+
+def evidence_thumbnail_url(url, request):
+    """Thumbnail URL for evidence stored by this app; external URLs pass through"""
+    content_hash = content_hash_from_url(url)
+    if content_hash is None:
+        return url
+    return reverse('evidence-thumbnail', args=[content_hash], request=request)
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -33,6 +43,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
 class TrafficViolationSerializer(serializers.ModelSerializer):
     reported_by_username = serializers.CharField(source='reported_by.username', read_only=True)
     verified_by_username = serializers.CharField(source='verified_by.username', read_only=True, allow_null=True)
+    evidence_thumbnail = serializers.SerializerMethodField()
     
     class Meta:
         model = TrafficViolation
@@ -40,26 +51,36 @@ class TrafficViolationSerializer(serializers.ModelSerializer):
             'id', 'violation_id', 'violator_name', 'vehicle_number',
             'violation_type', 'severity', 'location', 'latitude', 'longitude',
             'description', 'violation_time', 'reported_by', 'reported_by_username',
-            'reported_at', 'evidence_image', 'is_verified', 'verified_by',
-            'verified_by_username', 'verified_at'
+            'reported_at', 'evidence_image', 'evidence_thumbnail', 'is_verified',
+            'verified_by', 'verified_by_username', 'verified_at'
         ]
         read_only_fields = ['id', 'reported_at', 'verified_at']
+    
+    def get_evidence_thumbnail(self, obj):
+        if not obj.evidence_image:
+            return None
+        return evidence_thumbnail_url(obj.evidence_image, self.context.get('request'))
 
 
 class TrafficReportSerializer(serializers.ModelSerializer):
     reporter_username = serializers.CharField(source='reporter.username', read_only=True)
     reviewed_by_username = serializers.CharField(source='reviewed_by.username', read_only=True, allow_null=True)
     violation = TrafficViolationSerializer(read_only=True)
+    evidence_thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = TrafficReport
         fields = [
             'id', 'report_id', 'violation', 'reporter', 'reporter_username',
-            'description', 'evidence_urls', 'status', 'submitted_at',
-            'reviewed_at', 'reviewed_by', 'reviewed_by_username',
+            'description', 'evidence_urls', 'evidence_thumbnails', 'status',
+            'submitted_at', 'reviewed_at', 'reviewed_by', 'reviewed_by_username',
             'review_comments', 'reward_points'
         ]
         read_only_fields = ['id', 'submitted_at', 'reviewed_at', 'reward_points']
+    
+    def get_evidence_thumbnails(self, obj):
+        request = self.context.get('request')
+        return [evidence_thumbnail_url(url, request) for url in obj.evidence_urls or []]
 
 
 class FineSerializer(serializers.ModelSerializer):
@@ -125,3 +146,24 @@ class ViolationDetailSerializer(serializers.ModelSerializer):
             'evidence_image', 'is_verified', 'reports', 'fine'
         ]
         read_only_fields = fields
+
+
+class IoTSensorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IoTSensor
+        fields = [
+            'id', 'sensor_id', 'sensor_type', 'location', 'latitude',
+            'longitude', 'is_active', 'installed_at', 'last_reading_at'
+        ]
+        read_only_fields = ['id', 'installed_at', 'last_reading_at']
+
+
+class SensorReadingBatchSerializer(serializers.Serializer):
+    """A batch of readings; timestamps are epoch seconds"""
+    timestamps = serializers.ListField(child=serializers.FloatField(), allow_empty=False)
+    values = serializers.ListField(child=serializers.FloatField(), allow_empty=False)
+    
+    def validate(self, data):
+        if len(data['timestamps']) != len(data['values']):
+            raise serializers.ValidationError('timestamps and values must have the same length')
+        return data
@@ -0,0 +1,506 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .management.commands.check_query_plans import explain_hot_queries
+from .models import TrafficViolation, TrafficReport, Fine, Notification, IoTSensor, SensorReadingChunk
+from .reconciliation import reconcile_settlement
+from .forecasting import PatternEngine, REFRESH_SECONDS, get_engine
+from . import evidence, scoring, timeseries
+
+
+class QueryPlanTests(TestCase):
+    """
+    Hot endpoints must use their dedicated index. Runs against the configured
+    backend: SQLite by default, PostgreSQL when POSTGRES_DB is set.
+    """
+
+    def test_hot_queries_use_their_index(self):
+        for name, index_name, plan in explain_hot_queries():
+            with self.subTest(endpoint=name):
+                self.assertIn(index_name, plan)
+
+
+class QueryPlanRegressionTests(TransactionTestCase):
+    """Dropping an index must make check_query_plans fail"""
+
+    def test_missing_index_is_reported(self):
+        index = next(index for index in Notification._meta.indexes if index.name == 'notification_unread_idx')
+        with connection.schema_editor() as editor:
+            editor.remove_index(Notification, index)
+        try:
+            with self.assertRaisesMessage(CommandError, 'notifications/unread'):
+                call_command('check_query_plans', stdout=io.StringIO())
+        finally:
+            with connection.schema_editor() as editor:
+                editor.add_index(Notification, index)
+
+
+class ReconciliationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='reporter')
+        for i in range(3):
+            violation = TrafficViolation.objects.create(
+                violation_id=f'V{i}', violator_name='Driver', vehicle_number=f'KA01{i}',
+                violation_type='SPEEDING', location='MG Road', description='',
+                violation_time=timezone.now(), reported_by=user
+            )
+            Fine.objects.create(
+                fine_id=f'F{i}', violation=violation, base_amount=Decimal('500.00'),
+                final_amount=Decimal('500.00'), amount_after_discount=Decimal('500.00'),
+                due_date=timezone.now().date()
+            )
+
+    def reconcile(self, text, **kwargs):
+        return reconcile_settlement(io.StringIO(text), **kwargs)
+
+    def reasons(self, result):
+        return [(mismatch['line'], mismatch['reason']) for mismatch in result['mismatches']]
+
+    def test_applies_matching_rows(self):
+        result = self.reconcile('fine_id,transaction_id,amount\nF0,T0,500.00\nF1,T1,\n')
+        self.assertEqual(result['applied'], 2)
+        fine = Fine.objects.get(fine_id='F0')
+        self.assertEqual((fine.payment_status, fine.transaction_id), ('PAID', 'T0'))
+
+    def test_replay_is_idempotent(self):
+        settlement = 'fine_id,transaction_id\nF0,T0\n,T1\n'
+        self.reconcile('fine_id,transaction_id\nF0,T0\nF1,T1\n')
+        result = self.reconcile(settlement)
+        self.assertEqual((result['applied'], result['already_applied']), (0, 2))
+        self.assertEqual(result['mismatches'], [])
+
+        # Rows repeating a replayed settlement are reported as on the first run
+        result = self.reconcile('fine_id,transaction_id\nF0,T0\nF0,T0\n,T0\n')
+        self.assertEqual((result['applied'], result['already_applied']), (0, 1))
+        self.assertEqual(self.reasons(result), [(3, 'DUPLICATE_TRANSACTION'), (4, 'DUPLICATE_TRANSACTION')])
+
+    def test_duplicates_within_a_file_are_reported(self):
+        result = self.reconcile('fine_id,transaction_id\nF0,T0\n,T0\nF0,T9\nF1,T0\n', chunk_size=2)
+        self.assertEqual((result['applied'], result['already_applied']), (1, 0))
+        self.assertEqual(self.reasons(result), [
+            (3, 'DUPLICATE_TRANSACTION'), (4, 'DUPLICATE_TRANSACTION'), (5, 'DUPLICATE_TRANSACTION'),
+        ])
+
+    def test_dry_run_reports_duplicates_without_writing(self):
+        result = self.reconcile('fine_id,transaction_id\nF0,T0\n,T0\n', dry_run=True)
+        self.assertEqual(self.reasons(result), [(3, 'DUPLICATE_TRANSACTION')])
+        self.assertEqual(Fine.objects.get(fine_id='F0').payment_status, 'PENDING')
+
+    def test_mismatches(self):
+        Fine.objects.filter(fine_id='F2').update(payment_status='WAIVED')
+        result = self.reconcile('fine_id,transaction_id,amount\nF9,T9,\nF0,T0,1.00\nF2,T2,\n,,\n')
+        self.assertEqual(self.reasons(result), [
+            (2, 'FINE_NOT_FOUND'), (3, 'AMOUNT_MISMATCH'), (4, 'NOT_PAYABLE_WAIVED'), (5, 'MISSING_TRANSACTION_ID'),
+        ])
+
+
+class RiskScoringTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reliable = User.objects.create(username='reliable')
+        cls.unreliable = User.objects.create(username='unreliable')
+        for i in range(6):
+            cls.violation(f'R{i}', cls.reliable, severity=3, evidence_image='https://example.com/r.jpg', is_verified=True)
+            rejected = cls.violation(f'U{i}', cls.unreliable, violation_type='PARKING')
+            TrafficReport.objects.create(
+                report_id=f'REP{i}', violation=rejected, reporter=cls.unreliable,
+                description='', status='REJECTED'
+            )
+
+    @staticmethod
+    def violation(violation_id, reporter, **fields):
+        fields = {'violation_type': 'SPEEDING', 'description': 'Seen at the junction', **fields}
+        return TrafficViolation.objects.create(
+            violation_id=violation_id, violator_name='Driver', vehicle_number=violation_id,
+            location='MG Road', violation_time=timezone.now(), reported_by=reporter, **fields
+        )
+
+    def setUp(self):
+        model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, model_dir)
+        override = override_settings(RISK_MODEL_PATH=os.path.join(model_dir, 'risk.joblib'))
+        override.enable()
+        self.addCleanup(override.disable)
+        cache = mock.patch.dict(scoring._model_cache, {'mtime': None, 'model': None})
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    def test_trains_on_labelled_history(self):
+        samples, accuracy = scoring.train_model()
+        self.assertEqual(samples, 12)
+        self.assertGreater(accuracy, 0.5)
+        self.assertIsNotNone(scoring.get_model())
+
+    def test_training_needs_both_outcomes(self):
+        TrafficReport.objects.all().delete()
+        with self.assertRaises(ValueError):
+            scoring.train_model()
+
+    def test_features_leave_each_row_out_of_its_reporter_record(self):
+        rows = list(TrafficViolation.objects.filter(violation_id__in=['R0', 'U0']).order_by('violation_id')
+                    .values(*scoring.FEATURE_FIELDS))
+        reporter_rate = scoring.build_features(rows)[:, 4]
+        # R0: 5 of the reporter's 5 other violations verified; U0: 0 of 5
+        self.assertAlmostEqual(reporter_rate[0], (5 + 1) / (5 + 2))
+        self.assertAlmostEqual(reporter_rate[1], (0 + 1) / (5 + 2))
+
+    def create_violation(self, violation_id):
+        response = APIClient().post('/api/violations/', {
+            'violation_id': violation_id, 'violator_name': 'Driver', 'vehicle_number': violation_id,
+            'violation_type': 'SPEEDING', 'severity': 3, 'location': 'MG Road', 'description': 'Seen',
+            'violation_time': timezone.now().isoformat(), 'reported_by': self.reliable.pk,
+            'evidence_image': 'https://example.com/new.jpg',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return TrafficViolation.objects.get(violation_id=violation_id)
+
+    def test_create_scores_new_violations(self):
+        self.assertEqual(self.create_violation('N0').risk_score, 0.0)
+        scoring.train_model()
+        self.assertGreater(self.create_violation('N1').risk_score, 0.5)
+
+    def test_pending_review_orders_by_risk_then_recency(self):
+        now = timezone.now()
+        for i, (risk, age) in enumerate([(0.2, 1), (0.9, 3), (0.9, 1), (0.5, 2)]):
+            TrafficViolation.objects.filter(violation_id=f'U{i}').update(
+                risk_score=risk, reported_at=now - timedelta(hours=age)
+            )
+        TrafficViolation.objects.filter(violation_id__in=['U4', 'U5']).delete()
+
+        response = APIClient().get('/api/violations/pending_review/')
+        self.assertEqual(
+            [row['violation_id'] for row in response.data['results']],
+            ['U2', 'U1', 'U3', 'U0']
+        )
+
+
+class EvidenceTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def image_file(self, color=(200, 40, 40)):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), color).save(buffer, 'JPEG')
+        buffer.seek(0)
+        buffer.name = 'evidence.jpg'
+        return buffer
+
+    def test_identical_images_are_stored_once(self):
+        first = evidence.ingest(self.image_file())
+        second = evidence.ingest(self.image_file())
+        self.assertEqual(first, second)
+        self.assertEqual(list(evidence.iter_content_hashes()), [first])
+
+    def test_rejected_uploads_leave_no_temp_files(self):
+        class FailingUpload(io.BytesIO):
+            def read(self, size=-1):
+                raise OSError('connection reset')
+
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            with self.assertRaisesMessage(ValueError, 'too large'):
+                evidence.ingest(self.image_file())
+        with self.assertRaises(OSError):
+            evidence.ingest(FailingUpload())
+        self.assertEqual(os.listdir(os.path.join(evidence.evidence_root(), 'incoming')), [])
+        self.assertEqual(list(evidence.iter_content_hashes()), [])
+
+    def test_concurrent_lazy_renders(self):
+        content_hash = evidence.ingest(self.image_file())
+        paths, errors = [], []
+
+        def render():
+            try:
+                paths.append(evidence.get_derivative(content_hash, 'thumbnail'))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=render) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(set(paths), {evidence.derivative_path(content_hash, 'thumbnail')})
+        with Image.open(paths[0]) as image:
+            self.assertEqual((image.format, max(image.size)), ('WEBP', evidence.VARIANTS['thumbnail']))
+        leftovers = [name for name in os.listdir(os.path.dirname(paths[0])) if name.endswith('.tmp')]
+        self.assertEqual(leftovers, [])
+
+    def test_list_serves_thumbnails_for_uploaded_evidence(self):
+        client = APIClient()
+        upload = client.post('/api/evidence/', {'image': self.image_file()}, format='multipart')
+        self.assertEqual(upload.status_code, 201)
+
+        user = User.objects.create(username='reporter')
+        TrafficViolation.objects.create(
+            violation_id='V1', violator_name='Driver', vehicle_number='KA011',
+            violation_type='PARKING', location='MG Road', description='',
+            violation_time=timezone.now(), reported_by=user, evidence_image=upload.data['url']
+        )
+        listing = client.get('/api/violations/')
+        self.assertEqual(listing.status_code, 200)
+        thumbnail_url = listing.data['results'][0]['evidence_thumbnail']
+        self.assertEqual(thumbnail_url, upload.data['thumbnail_url'])
+
+        thumbnail = client.get(thumbnail_url)
+        self.assertEqual((thumbnail.status_code, thumbnail['Content-Type']), (200, 'image/webp'))
+        thumbnail.close()
+
+
+class TimeSeriesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = IoTSensor.objects.create(sensor_id='S1', sensor_type='SPEED', location='MG Road')
+        cls.start = int(datetime(2024, 1, 1, tzinfo=dt_timezone.utc).timestamp() * 1000)
+
+    def at(self, minutes):
+        return self.start + minutes * 60 * 1000
+
+    def ingest_two_hours(self):
+        """Two readings in each of the first two windows and one in the third"""
+        timeseries.ingest(self.sensor, [self.at(m) for m in (0, 30, 60, 90, 120)], [10.0, 20.0, 30.0, 40.0, 50.0])
+
+    def summary(self, buckets):
+        return [
+            (timeseries.to_ms(bucket['bucket_start']), bucket['count'], bucket['min'], bucket['max'], bucket['avg'])
+            for bucket in buckets
+        ]
+
+    def test_encode_decode_round_trip(self):
+        timestamps = np.array([self.at(0), self.at(1) + 7, self.at(59) + 999])
+        values = [1.5, -2.25, 80.0]
+        encoded_timestamps, encoded_values = timeseries.encode(timestamps, values, self.start)
+        chunk = SensorReadingChunk(
+            window_start=timeseries.to_datetime(self.start), timestamps=encoded_timestamps, values=encoded_values
+        )
+        decoded_timestamps, decoded_values = timeseries.decode(chunk)
+        self.assertEqual(decoded_timestamps.tolist(), timestamps.tolist())
+        self.assertEqual(decoded_values.tolist(), values)
+
+    def test_repeated_timestamps_keep_the_newer_value(self):
+        timeseries.ingest(self.sensor, [self.at(1), self.at(0)], [20.0, 10.0])
+        timeseries.ingest(self.sensor, [self.at(1), self.at(2)], [25.0, 30.0])
+        chunk = self.sensor.reading_chunks.get()
+        self.assertEqual(
+            (chunk.reading_count, chunk.min_value, chunk.max_value, chunk.sum_value), (3, 10.0, 30.0, 65.0)
+        )
+        timestamps, values = timeseries.decode(chunk)
+        self.assertEqual(timestamps.tolist(), [self.at(0), self.at(1), self.at(2)])
+        self.assertEqual(values.tolist(), [10.0, 25.0, 30.0])
+
+    def test_window_opened_by_a_concurrent_batch_is_merged(self):
+        bulk_create = SensorReadingChunk.objects.bulk_create
+
+        def concurrent_batch_first(chunks, **kwargs):
+            # Another batch opens the same window between our lookup and insert
+            with mock.patch.object(SensorReadingChunk.objects, 'bulk_create', bulk_create):
+                timeseries.ingest(self.sensor, [self.at(5)], [50.0])
+            return bulk_create(chunks, **kwargs)
+
+        with mock.patch.object(SensorReadingChunk.objects, 'bulk_create', side_effect=concurrent_batch_first):
+            timeseries.ingest(self.sensor, [self.at(1)], [10.0])
+        chunk = self.sensor.reading_chunks.get()
+        self.assertEqual((chunk.reading_count, chunk.sum_value), (2, 60.0))
+
+    def test_downsample_bucket_spanning_two_windows(self):
+        self.ingest_two_hours()
+        buckets = timeseries.downsample(self.sensor, self.at(30), self.at(90), timeseries.WINDOW_MS)
+        self.assertEqual(self.summary(buckets), [(self.at(30), 2, 20.0, 30.0, 25.0)])
+
+    def test_downsample_uses_summaries_of_whole_windows(self):
+        self.ingest_two_hours()
+        with mock.patch.object(timeseries, 'decode', wraps=timeseries.decode) as decode:
+            buckets = timeseries.downsample(self.sensor, self.at(0), self.at(120), 2 * timeseries.WINDOW_MS)
+        decode.assert_not_called()
+        self.assertEqual(self.summary(buckets), [(self.at(0), 4, 10.0, 40.0, 25.0)])
+
+    def test_range_includes_start_and_excludes_end(self):
+        self.ingest_two_hours()
+        buckets = timeseries.downsample(self.sensor, self.at(30), self.at(120), 30 * 60 * 1000)
+        self.assertEqual(self.summary(buckets), [
+            (self.at(30), 1, 20.0, 20.0, 20.0), (self.at(60), 1, 30.0, 30.0, 30.0), (self.at(90), 1, 40.0, 40.0, 40.0),
+        ])
+        readings = list(timeseries.iter_readings(self.sensor, self.at(30), self.at(120)))
+        self.assertEqual([timestamps.tolist() for timestamps, _ in readings], [[self.at(30)], [self.at(60), self.at(90)]])
+        self.assertEqual([values.tolist() for _, values in readings], [[20.0], [30.0, 40.0]])
+
+    def test_downsample_rejects_too_many_buckets(self):
+        with self.assertRaises(ValueError):
+            timeseries.downsample(self.sensor, self.at(0), self.at(120), 1)
+
+    def test_readings_endpoints(self):
+        client = APIClient()
+        url = '/api/sensors/S1/readings/'
+        seconds = self.start / 1000
+        response = client.post(url, {'timestamps': [seconds, seconds + 60], 'values': [10, 20]}, format='json')
+        self.assertEqual((response.status_code, response.data), (201, {'ingested': 2}))
+        response = client.post(url, {'timestamps': [seconds], 'values': [1, 2]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        window = {'start': '2024-01-01T00:00:00Z', 'end': '2024-01-01T01:00:00Z'}
+        response = client.get(url, {**window, 'bucket': 3600})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(bucket['count'], bucket['avg']) for bucket in response.data['buckets']], [(2, 15.0)])
+        self.assertEqual(client.get(url, {'start': 'tomorrow'}).status_code, 400)
+        self.assertEqual(client.get(url, {**window, 'bucket': 0}).status_code, 400)
+
+        response = client.get('/api/sensors/S1/export/', window)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            'timestamp,value\n1704067200.000,10\n1704067260.000,20\n'
+        )
+
+    def test_bulk_readings(self):
+        IoTSensor.objects.create(sensor_id='S2', sensor_type='LOOP', location='MG Road')
+        client = APIClient()
+        url = '/api/sensors/bulk_readings/'
+        seconds = self.start / 1000
+        response = client.post(url, {
+            'S1': {'timestamps': [seconds], 'values': [10]},
+            'S2': {'timestamps': [seconds, seconds + 1], 'values': [1, 2]},
+        }, format='json')
+        self.assertEqual((response.status_code, response.data), (201, {'ingested': {'S1': 1, 'S2': 2}}))
+
+        response = client.post(url, {'S9': {'timestamps': [seconds], 'values': [1]}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = client.post(url, {
+            'S1': {'timestamps': [seconds + 5], 'values': [30]},
+            'S2': {'timestamps': [seconds + 5], 'values': [3, 4]},
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        # A rejected batch stores nothing for any sensor
+        self.assertEqual(self.sensor.reading_chunks.get().reading_count, 1)
+
+
+class PatternEngineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sensor = IoTSensor.objects.create(sensor_id='S1', sensor_type='LOOP', location='MG Road')
+        cls.user = User.objects.create(username='reporter')
+        cls.start = int(datetime(2024, 1, 1, tzinfo=dt_timezone.utc).timestamp() * 1000)
+
+    def ingest(self, hour, values, sensor=None):
+        start = self.start + hour * timeseries.WINDOW_MS
+        timeseries.ingest(sensor or self.sensor, [start + i * 1000 for i in range(len(values))], values)
+
+    def assertSameProfiles(self, engine):
+        full = PatternEngine()
+        full.refit(full=True)
+        self.assertEqual(set(engine.locations), set(full.locations))
+        for location, row in engine.locations.items():
+            for name in ('violation_counts', 'sensor_sums', 'sensor_counts'):
+                with self.subTest(location=location, matrix=name):
+                    ours = getattr(engine, name)[..., row, :]
+                    self.assertTrue((ours == getattr(full, name)[..., full.locations[location], :]).all())
+
+    def test_incremental_refit_matches_full_refit(self):
+        self.ingest(0, [10.0, 20.0])
+        engine = PatternEngine()
+        engine.refit(full=True)
+
+        # Grow the newest window, open a new one and report a violation
+        self.ingest(0, [30.0])
+        self.ingest(1, [40.0])
+        TrafficViolation.objects.create(
+            violation_id='V1', violator_name='Driver', vehicle_number='KA011',
+            violation_type='SPEEDING', location='Ring Road', description='',
+            violation_time=timeseries.to_datetime(self.start), reported_by=self.user
+        )
+        engine.refit()
+        self.assertSameProfiles(engine)
+
+    def test_readings_arriving_during_a_refit_are_counted_once(self):
+        self.ingest(0, [10.0])
+        engine = PatternEngine()
+        aggregate = engine._sensor_aggregate
+
+        def aggregate_then_ingest(since, until):
+            rows = aggregate(since, until)
+            if not self.ingested:
+                self.ingested = True
+                self.ingest(2, [50.0])
+            return rows
+
+        self.ingested = False
+        with mock.patch.object(engine, '_sensor_aggregate', side_effect=aggregate_then_ingest):
+            engine.refit(full=True)
+        engine.refit()
+        self.assertSameProfiles(engine)
+
+    def test_refresh_skips_while_another_refit_runs(self):
+        engine = PatternEngine()
+        engine.refit(full=True)
+        engine.refreshed_at = time.monotonic() - REFRESH_SECONDS - 1
+
+        with mock.patch.object(engine, '_refit') as refit:
+            with engine._lock:
+                engine.refresh()
+            refit.assert_not_called()
+            engine.refresh()
+            refit.assert_called_once_with(full=False)
+
+    def test_sensor_types_are_profiled_separately(self):
+        speed = IoTSensor.objects.create(sensor_id='S2', sensor_type='SPEED', location='MG Road')
+        # Hour 0 is busy (many vehicles, slow), hour 1 is quiet (few vehicles, fast)
+        self.ingest(0, [90.0, 110.0])
+        self.ingest(1, [10.0])
+        self.ingest(0, [15.0], speed)
+        self.ingest(1, [45.0], speed)
+        engine = PatternEngine()
+        engine.refit(full=True)
+
+        forecast = engine.forecast(start=timeseries.to_datetime(self.start), hours=2)
+        self.assertEqual(forecast['sensor_levels']['LOOP'].tolist(), [[100.0, 10.0]])
+        self.assertEqual(forecast['sensor_levels']['SPEED'].tolist(), [[15.0, 45.0]])
+        # Loop counts against their 70/hour mean; speed inverted against its 30 km/h mean
+        busy, quiet = forecast['congestion_index'][0]
+        self.assertAlmostEqual(busy, (100 / 70 + 30 / 15) / 2)
+        self.assertAlmostEqual(quiet, (10 / 70 + 30 / 45) / 2)
+
+    def test_forecast_rejects_invalid_start(self):
+        client = APIClient()
+        for start in ('2024-13-01T00:00', 'tomorrow'):
+            with self.subTest(start=start):
+                self.assertEqual(client.get('/api/patterns/', {'start': start}).status_code, 400)
+
+    def test_refit_endpoint_is_admin_only_and_runs_in_background(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.post('/api/patterns/refit/').status_code, 403)
+
+        client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        engine = get_engine(refresh=False)
+        with mock.patch.object(engine, '_start_background_refit') as start_refit:
+            self.assertEqual(client.post('/api/patterns/refit/').status_code, 202)
+            # The worker holds the lock until it finishes
+            self.assertEqual(client.post('/api/patterns/refit/').status_code, 409)
+        engine._lock.release()
+        start_refit.assert_called_once_with()
@@ -0,0 +1,178 @@
+"""
+Compact sensor time-series storage: per-sensor, per-window array chunks
+"""
+import zlib
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import transaction
+
+from .models import SensorReadingChunk
+
+
+WINDOW_MS = 3600 * 1000  # one chunk per sensor per hour
+MAX_BUCKETS = 10000
+ITERATOR_CHUNK_SIZE = 24  # chunk rows fetched per round trip when streaming
+
+
+def to_datetime(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc)
+
+
+def to_ms(value):
+    return int(value.timestamp() * 1000)
+
+
+def encode(timestamps, values, window_start):
+    """Delta-encode sorted epoch-ms timestamps relative to the window start"""
+    deltas = np.diff(timestamps, prepend=window_start).astype('<u4')
+    return (
+        zlib.compress(deltas.tobytes()),
+        zlib.compress(np.asarray(values, dtype='<f4').tobytes()),
+    )
+
+
+def decode(chunk):
+    """Absolute epoch-ms timestamps and values of a chunk"""
+    deltas = np.frombuffer(zlib.decompress(chunk.timestamps), dtype='<u4')
+    timestamps = to_ms(chunk.window_start) + np.cumsum(deltas, dtype=np.int64)
+    values = np.frombuffer(zlib.decompress(chunk.values), dtype='<f4')
+    return timestamps, values
+
+
+def _merge(timestamps, values, new_timestamps, new_values):
+    """Sorted union of two series; a repeated timestamp keeps the newer value"""
+    timestamps = np.concatenate([timestamps, new_timestamps])
+    values = np.concatenate([values, new_values])
+    order = np.argsort(timestamps, kind='stable')
+    timestamps, values = timestamps[order], values[order]
+    keep = np.append(timestamps[1:] != timestamps[:-1], True)
+    return timestamps[keep], values[keep]
+
+
+def ingest(sensor, timestamps, values):
+    """
+    Append a batch of readings (epoch-ms timestamps, float values) to a sensor.
+    Each affected window is read and rewritten once per batch, so callers
+    should send readings in batches rather than one at a time.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float32)
+    if timestamps.shape != values.shape or timestamps.ndim != 1:
+        raise ValueError('timestamps and values must be flat arrays of equal length')
+    if not len(timestamps):
+        return 0
+
+    # Sort the batch and drop repeated timestamps
+    timestamps, values = _merge(timestamps[:0], values[:0], timestamps, values)
+    windows = timestamps - timestamps % WINDOW_MS
+    boundaries = np.flatnonzero(np.diff(windows)) + 1
+    window_starts = windows[np.r_[0, boundaries]]
+
+    with transaction.atomic():
+        window_times = [to_datetime(int(start)) for start in window_starts]
+        locked = sensor.reading_chunks.select_for_update()
+        existing = {to_ms(chunk.window_start): chunk for chunk in locked.filter(window_start__in=window_times)}
+        missing = [window for window in window_times if to_ms(window) not in existing]
+        if missing:
+            # FOR UPDATE can't lock windows that don't exist yet, and a concurrent
+            # batch may be opening the same ones: insert empty windows, skipping
+            # any that win the race, then lock whichever rows ended up stored
+            empty_timestamps, empty_values = encode(timestamps[:0], values[:0], 0)
+            SensorReadingChunk.objects.bulk_create([
+                SensorReadingChunk(
+                    sensor=sensor, window_start=window, reading_count=0, min_value=0.0, max_value=0.0,
+                    sum_value=0.0, timestamps=empty_timestamps, values=empty_values
+                )
+                for window in missing
+            ], ignore_conflicts=True)
+            existing.update({to_ms(chunk.window_start): chunk for chunk in locked.filter(window_start__in=missing)})
+
+        for start, ts, vals in zip(window_starts, np.split(timestamps, boundaries), np.split(values, boundaries)):
+            chunk = existing[int(start)]
+            if chunk.reading_count:
+                ts, vals = _merge(*decode(chunk), ts, vals)
+            chunk.timestamps, chunk.values = encode(ts, vals, int(start))
+            chunk.reading_count = len(ts)
+            chunk.min_value = float(vals.min())
+            chunk.max_value = float(vals.max())
+            chunk.sum_value = float(vals.sum(dtype=np.float64))
+            chunk.save()
+
+        last_reading_at = to_datetime(int(timestamps[-1]))
+        if sensor.last_reading_at is None or last_reading_at > sensor.last_reading_at:
+            sensor.last_reading_at = last_reading_at
+            sensor.save(update_fields=['last_reading_at'])
+    return len(timestamps)
+
+
+def _chunks_in_range(sensor, start_ms, end_ms):
+    return sensor.reading_chunks.filter(
+        window_start__gt=to_datetime(start_ms - WINDOW_MS),
+        window_start__lt=to_datetime(end_ms),
+    ).order_by('window_start').iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+
+def iter_readings(sensor, start_ms, end_ms):
+    """Yield (timestamps, values) arrays one window at a time within [start, end)"""
+    for chunk in _chunks_in_range(sensor, start_ms, end_ms):
+        timestamps, values = decode(chunk)
+        mask = (timestamps >= start_ms) & (timestamps < end_ms)
+        if mask.any():
+            yield timestamps[mask], values[mask]
+
+
+def downsample(sensor, start_ms, end_ms, bucket_ms):
+    """
+    min/max/avg/count per bucket over [start, end). Windows that fall wholly
+    inside one bucket are aggregated from their stored summary without decoding.
+    """
+    if bucket_ms <= 0 or end_ms <= start_ms:
+        raise ValueError('bucket size and time range must be positive')
+    bucket_count = -(-(end_ms - start_ms) // bucket_ms)
+    if bucket_count > MAX_BUCKETS:
+        raise ValueError(f'Range would produce more than {MAX_BUCKETS} buckets; use a larger bucket size')
+
+    counts = np.zeros(bucket_count, dtype=np.int64)
+    sums = np.zeros(bucket_count)
+    mins = np.full(bucket_count, np.inf)
+    maxs = np.full(bucket_count, -np.inf)
+
+    for chunk in _chunks_in_range(sensor, start_ms, end_ms):
+        window_start = to_ms(chunk.window_start)
+        window_end = window_start + WINDOW_MS
+        first_bucket = (window_start - start_ms) // bucket_ms
+        if (window_start >= start_ms and window_end <= end_ms
+                and first_bucket == (window_end - 1 - start_ms) // bucket_ms):
+            counts[first_bucket] += chunk.reading_count
+            sums[first_bucket] += chunk.sum_value
+            mins[first_bucket] = min(mins[first_bucket], chunk.min_value)
+            maxs[first_bucket] = max(maxs[first_bucket], chunk.max_value)
+            continue
+
+        timestamps, values = decode(chunk)
+        mask = (timestamps >= start_ms) & (timestamps < end_ms)
+        if not mask.any():
+            continue
+        buckets = (timestamps[mask] - start_ms) // bucket_ms
+        values = values[mask].astype(np.float64)
+        # Timestamps are sorted, so each bucket is a contiguous run
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ids = buckets[starts]
+        counts[ids] += np.diff(np.r_[starts, len(buckets)])
+        sums[ids] += np.add.reduceat(values, starts)
+        mins[ids] = np.minimum(mins[ids], np.minimum.reduceat(values, starts))
+        maxs[ids] = np.maximum(maxs[ids], np.maximum.reduceat(values, starts))
+
+    filled = np.flatnonzero(counts)
+    averages = sums[filled] / counts[filled]
+    return [
+        {
+            'bucket_start': to_datetime(start_ms + int(i) * bucket_ms),
+            'count': int(counts[i]),
+            'min': float(mins[i]),
+            'max': float(maxs[i]),
+            'avg': float(avg),
+        }
+        for i, avg in zip(filled, averages)
+    ]
@@ -2,21 +2,27 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ViolationViewSet,
+    TrafficReportViewSet,
     FineViewSet,
     UserProfileViewSet,
-    VehicleViewSet,
+    LeaderboardViewSet,
+    NotificationViewSet,
     TrafficPatternViewSet,
-    IoTSensorViewSet
+    IoTSensorViewSet,
+    EvidenceViewSet
 )
 
 # Create router and register viewsets
 router = DefaultRouter()
 router.register(r'violations', ViolationViewSet, basename='violation')
+router.register(r'reports', TrafficReportViewSet, basename='report')
 router.register(r'fines', FineViewSet, basename='fine')
 router.register(r'profiles', UserProfileViewSet, basename='profile')
-router.register(r'vehicles', VehicleViewSet, basename='vehicle')
+router.register(r'leaderboard', LeaderboardViewSet, basename='leaderboard')
+router.register(r'notifications', NotificationViewSet, basename='notification')
 router.register(r'patterns', TrafficPatternViewSet, basename='pattern')
 router.register(r'sensors', IoTSensorViewSet, basename='sensor')
+router.register(r'evidence', EvidenceViewSet, basename='evidence')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -2,21 +2,33 @@ from rest_framework import viewsets, status, filters, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.reverse import reverse
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Q, Count, Sum
 from django.utils import timezone
 from django.contrib.auth.models import User
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
+import io
+import numpy as np
 
 from .models import (
     TrafficViolation, UserProfile, TrafficReport,
-    Fine, Leaderboard, Notification
+    Fine, Leaderboard, Notification, IoTSensor
 )
 from .serializers import (
     TrafficViolationSerializer, UserProfileSerializer, TrafficReportSerializer,
     FineSerializer, LeaderboardSerializer, NotificationSerializer,
-    ViolationDetailSerializer, UserSerializer
+    ViolationDetailSerializer, UserSerializer, IoTSensorSerializer,
+    SensorReadingBatchSerializer
 )
+from .reconciliation import reconcile_settlement
+from . import evidence
+from .scoring import score_queryset
+from . import timeseries
+from .forecasting import get_engine
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -41,6 +53,10 @@ class ViolationViewSet(viewsets.ModelViewSet):
             return ViolationDetailSerializer
         return TrafficViolationSerializer
     
+    def perform_create(self, serializer):
+        violation = serializer.save()
+        score_queryset(TrafficViolation.objects.filter(pk=violation.pk))
+    
     @action(detail=True, methods=['post'])
     def verify_violation(self, request, pk=None):
         """Verify a traffic violation"""
@@ -53,8 +69,8 @@ class ViolationViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def pending_review(self, request):
-        """Get violations pending verification"""
-        violations = self.queryset.filter(is_verified=False)
+        """Get violations pending verification, likeliest to be upheld first"""
+        violations = self.queryset.filter(is_verified=False).order_by('-risk_score', '-reported_at')
         page = self.paginate_queryset(violations)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -193,10 +209,24 @@ class FineViewSet(viewsets.ModelViewSet):
         fine.payment_status = 'PAID'
         fine.paid_date = timezone.now().date()
         fine.payment_method = request.data.get('payment_method', 'online')
-        fine.transaction_id = request.data.get('transaction_id', '')
+        # Blank ids are stored as NULL so they don't collide on the unique constraint
+        fine.transaction_id = request.data.get('transaction_id') or None
         fine.save()
         return Response({'status': 'fine marked as paid'})
     
+    @action(detail=False, methods=['post'])
+    def reconcile(self, request):
+        """Apply a payment gateway settlement CSV in bulk"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'settlement file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            result = reconcile_settlement(io.TextIOWrapper(upload.file, encoding='utf-8-sig'), dry_run=dry_run)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+    
     @action(detail=False, methods=['get'])
     def overdue_fines(self, request):
         """Get overdue fines"""
@@ -276,3 +306,183 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             is_read=False
         ).update(is_read=True, read_at=timezone.now())
         return Response({'status': 'all notifications marked as read'})
+
+
+class EvidenceViewSet(viewsets.ViewSet):
+    """Evidence image upload and cached thumbnail/WebP derivatives"""
+    lookup_value_regex = '[0-9a-f]{64}'
+    
+    def _file_response(self, path, content_type=None):
+        if path is None:
+            raise Http404
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        # Content-addressed, so a URL always maps to the same bytes
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+    
+    def create(self, request):
+        """Upload an evidence image; identical images are stored once"""
+        upload = request.FILES.get('image')
+        if upload is None:
+            return Response({'error': 'image file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            content_hash = evidence.ingest(upload)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'content_hash': content_hash,
+            'url': reverse('evidence-detail', args=[content_hash], request=request),
+            'thumbnail_url': reverse('evidence-thumbnail', args=[content_hash], request=request),
+        }, status=status.HTTP_201_CREATED)
+    
+    def retrieve(self, request, pk=None):
+        """Serve the original image"""
+        return self._file_response(evidence.original_path(pk))
+    
+    @action(detail=True, methods=['get'])
+    def thumbnail(self, request, pk=None):
+        """Serve the thumbnail, generating it on first request"""
+        return self._file_response(evidence.get_derivative(pk, 'thumbnail'), 'image/webp')
+    
+    @action(detail=True, methods=['get'])
+    def preview(self, request, pk=None):
+        """Serve the full-screen WebP preview, generating it on first request"""
+        return self._file_response(evidence.get_derivative(pk, 'preview'), 'image/webp')
+
+
+class IoTSensorViewSet(viewsets.ModelViewSet):
+    """ViewSet for IoT sensors and their reading time series"""
+    queryset = IoTSensor.objects.all()
+    serializer_class = IoTSensorSerializer
+    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_fields = ['sensor_type', 'is_active']
+    search_fields = ['sensor_id', 'location']
+    lookup_field = 'sensor_id'
+    
+    def _time_range(self, request):
+        """Parse ?start=&end= (ISO 8601) into epoch ms; defaults to the last hour"""
+        end = parse_datetime(request.query_params['end']) if 'end' in request.query_params else timezone.now()
+        start = parse_datetime(request.query_params['start']) if 'start' in request.query_params else end - timedelta(hours=1)
+        if start is None or end is None:
+            raise ValueError('start and end must be ISO 8601 datetimes')
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        if timezone.is_naive(end):
+            end = timezone.make_aware(end)
+        return timeseries.to_ms(start), timeseries.to_ms(end)
+    
+    def _ingest(self, sensor, data):
+        serializer = SensorReadingBatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        timestamps = [round(ts * 1000) for ts in serializer.validated_data['timestamps']]
+        return timeseries.ingest(sensor, timestamps, serializer.validated_data['values'])
+    
+    @action(detail=True, methods=['get', 'post'])
+    def readings(self, request, sensor_id=None):
+        """POST a batch of readings, or GET min/max/avg per bucket (?bucket=seconds)"""
+        sensor = self.get_object()
+        if request.method == 'POST':
+            stored = self._ingest(sensor, request.data)
+            return Response({'ingested': stored}, status=status.HTTP_201_CREATED)
+        try:
+            start, end = self._time_range(request)
+            bucket = int(request.query_params.get('bucket', 60))
+            buckets = timeseries.downsample(sensor, start, end, bucket * 1000)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'sensor_id': sensor.sensor_id, 'bucket_seconds': bucket, 'buckets': buckets})
+    
+    @action(detail=True, methods=['get'])
+    def export(self, request, sensor_id=None):
+        """Stream raw readings as CSV, one storage window at a time"""
+        sensor = self.get_object()
+        try:
+            start, end = self._time_range(request)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        def rows():
+            yield 'timestamp,value\n'
+            for timestamps, values in timeseries.iter_readings(sensor, start, end):
+                yield ''.join(f'{ts / 1000:.3f},{value:g}\n' for ts, value in zip(timestamps.tolist(), values.tolist()))
+        
+        return StreamingHttpResponse(rows(), content_type='text/csv')
+    
+    @action(detail=False, methods=['post'])
+    def bulk_readings(self, request):
+        """Ingest batches for many sensors at once: {"<sensor_id>": {"timestamps": [...], "values": [...]}}"""
+        if not isinstance(request.data, dict):
+            return Response({'error': 'expected an object keyed by sensor_id'}, status=status.HTTP_400_BAD_REQUEST)
+        sensors = {sensor.sensor_id: sensor for sensor in IoTSensor.objects.filter(sensor_id__in=list(request.data))}
+        missing = sorted(set(request.data) - set(sensors))
+        if missing:
+            return Response({'error': f"Unknown sensors: {', '.join(missing)}"}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            ingested = {sensor_id: self._ingest(sensors[sensor_id], batch) for sensor_id, batch in request.data.items()}
+        return Response({'ingested': ingested}, status=status.HTTP_201_CREATED)
+
+
+def _json_series(matrix, decimals=3):
+    """Round a float matrix to nested lists with NaN (no data) as None"""
+    matrix = np.round(matrix, decimals)
+    return np.where(np.isnan(matrix), None, matrix).tolist()
+
+
+class TrafficPatternViewSet(viewsets.ViewSet):
+    """Hour-of-week violation and congestion forecasts per location"""
+    
+    def list(self, request):
+        """Forecast the next ?hours= hours (default 24) for ?location= (repeatable; default all)"""
+        try:
+            start = request.query_params.get('start')
+            if start is not None:
+                start = parse_datetime(start)
+                if start is None:
+                    raise ValueError('start must be an ISO 8601 datetime')
+                if timezone.is_naive(start):
+                    start = timezone.make_aware(start)
+            forecast = get_engine().forecast(
+                locations=request.query_params.getlist('location') or None,
+                start=start,
+                hours=int(request.query_params.get('hours', 24)),
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        expected = _json_series(forecast['expected_violations'])
+        levels = {code: _json_series(matrix) for code, matrix in forecast['sensor_levels'].items()}
+        congestion_index = _json_series(forecast['congestion_index'])
+        return Response({
+            'start': forecast['start'],
+            'hours': forecast['hours'],
+            'forecasts': [
+                {
+                    'location': location,
+                    'expected_violations': expected[i],
+                    'sensor_levels': {code: series[i] for code, series in levels.items()},
+                    'congestion_index': congestion_index[i],
+                }
+                for i, location in enumerate(forecast['locations'])
+            ]
+        })
+    
+    @action(detail=False, methods=['get'])
+    def profile(self, request):
+        """Full 168-hour weekly profile for ?location= (hour 0 = Monday 00:00)"""
+        profile = get_engine().profile(request.query_params.get('location', ''))
+        if profile is None:
+            return Response({'error': 'unknown location'}, status=status.HTTP_404_NOT_FOUND)
+        rates, levels, congestion_index = profile
+        return Response({
+            'location': request.query_params['location'],
+            'violation_rate': _json_series(rates),
+            'sensor_levels': {code: _json_series(series) for code, series in levels.items()},
+            'congestion_index': _json_series(congestion_index),
+        })
+    
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def refit(self, request):
+        """Rebuild all profiles from scratch in the background (admins only)"""
+        if not get_engine(refresh=False).refit_in_background():
+            return Response({'status': 'refit already running'}, status=status.HTTP_409_CONFLICT)
+        return Response({'status': 'refit started'}, status=status.HTTP_202_ACCEPTED)